@@ -1,9 +1,12 @@
+from collections import defaultdict
 from itertools import groupby
+from operator import itemgetter
 from typing import List, Optional
 from django.contrib import admin
 from django.contrib.auth.models import User, Group
-from django.db import transaction
-from django.db.models import Count
+from django.db import connection, transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.db.models.query import QuerySet
 from django.http.response import Http404, HttpResponse
 from .models import BadKey, Voter, Poll, SendEmail, Key
@@ -11,6 +14,7 @@ from django import forms
 from django.core.exceptions import ValidationError
 from django.utils.html import format_html
 from django.contrib.admin import AdminSite
+from django.contrib.admin.views.main import ChangeList
 from django.contrib import messages
 from django.urls import path
 from django.shortcuts import render
@@ -21,6 +25,7 @@ from django.conf import settings
 from django.contrib import messages
 from secrets import SystemRandom
 from django.http import HttpRequest
+from django.utils.timezone import now as timezone_now
 
 
 class PollsAdminSite(AdminSite):
@@ -52,22 +57,24 @@ class PollsAdminSite(AdminSite):
             return HttpResponse("Голосование не начато")
 
         with transaction.atomic():
-            send_emails = SendEmail.objects.filter(
+            # concurrent print requests must not hand out the same bulletins
+            send_emails = SendEmail.objects.select_for_update(
+                skip_locked=connection.features.has_select_for_update_skip_locked,
+            ).filter(
                 visited=False,
                 poll=poll,
-                status=SendEmail.Status.LOCAL, secretary=request.user)
-            private_keys: List[Key] = []
-            for send_email in send_emails:
-                try:
-                    private_keys.append(poll.create_private_key_for(send_email))
-                except Exception as e:
-                    return HttpResponse(f"Ошибка: {e}")  # hope never happens
+                status=SendEmail.Status.LOCAL, secretary=request.user,
+            ).only("public_key", "visited")
+            try:
+                private_keys = poll.create_private_keys_for(list(send_emails))
+            except Exception as e:
+                return HttpResponse(f"Ошибка: {e}")  # hope never happens
             random.shuffle(private_keys)
             return render(
                 request,
                 "polls/print.html",
                 {
-                    "settings": settings,
+                    "EMAIL_LINK_START": settings.EMAIL_LINK_START,
                     "Poll": Poll,
                     "poll": poll,
                     "private_keys": private_keys
@@ -81,21 +88,26 @@ class PollsAdminSite(AdminSite):
             raise Http404()
         if poll.state != Poll.State.FINISHED:
             return HttpResponse("Голосование не завершено")
-        votes = Key.objects.filter(poll=poll).order_by("response", "value")
+        rows = (
+            Key.objects.filter(poll=poll)
+            .order_by("response", "value")
+            .values_list("response", "value")
+        )
         votes = {
-            response: list(keys)
-            for response, keys in groupby(votes, key=lambda item: item.response)
+            response: [value for _, value in group]
+            for response, group in groupby(rows, key=itemgetter(0))
         }
-        attended_count = SendEmail.objects.filter(poll=poll).count()
-        bulletins_visited = SendEmail.objects.filter(poll=poll, visited=True).count()
-        voters_count = Voter.objects.filter(secretary=poll.secretary).count()
-        voted_count = (
-            Key.objects.filter(poll=poll)
-            .exclude(response=Key.Response.NOT_RETURNED)
-            .count()
+        send_email_counts = SendEmail.objects.filter(poll=poll).aggregate(
+            attended=Count("pk"), visited=Count("pk", filter=Q(visited=True))
+        )
+        voters_count = Voter.objects.filter(secretary_id=poll.secretary_id).count()
+        voted_count = sum(
+            len(values)
+            for response, values in votes.items()
+            if response != Key.Response.NOT_RETURNED
         )
         bad_key_count = BadKey.objects.filter(poll=poll).count()
-        bad_keys_top_100 = BadKey.objects.filter(poll=poll)[0:100]
+        bad_keys_top_100 = BadKey.objects.filter(poll=poll).only("value", "timestamp")[0:100]
 
         return render(
             request,
@@ -104,8 +116,8 @@ class PollsAdminSite(AdminSite):
                 "poll": poll,
                 "votes": votes,
                 "Key": Key,
-                "attended_count": attended_count,
-                "bulletins_visited": bulletins_visited,
+                "attended_count": send_email_counts["attended"],
+                "bulletins_visited": send_email_counts["visited"],
                 "voters_count": voters_count,
                 "voted_count": voted_count,
                 "bad_key_count": bad_key_count,
@@ -151,6 +163,29 @@ class PollForm(forms.ModelForm):
         return self.cleaned_data
 
 
+class PollChangeList(ChangeList):
+    def get_results(self, request: HttpRequest):
+        # `Poll.text` can be large and is not shown in the list
+        self.queryset = self.queryset.defer("text")
+        super().get_results(request)
+
+
+def count_per_poll(queryset: QuerySet) -> Coalesce:
+    """
+    Number of `queryset` rows referencing the outer poll
+    """
+    return Coalesce(
+        Subquery(
+            queryset.filter(poll=OuterRef("pk"))
+            .order_by()
+            .values("poll")
+            .annotate(count=Count("pk"))
+            .values("count")
+        ),
+        0,
+    )
+
+
 class PollAdmin(LimitForSecretary):
     actions = ['start_poll', 'end_poll', 'duplicate_poll']
     search_fields = ("title",)
@@ -180,8 +215,17 @@ class PollAdmin(LimitForSecretary):
 
     def get_queryset(self, request: HttpRequest):
         qs = super().get_queryset(request)
+        # correlated subqueries, so the relations aren't joined into one product
         return qs.annotate(
-            Count("voter_local", distinct=True), Count("voter_remote", distinct=True)
+            voter_local__count=count_per_poll(
+                Poll.voter_local.through.objects.all()
+            ),
+            voter_remote__count=count_per_poll(
+                Poll.voter_remote.through.objects.all()
+            ),
+            voter_voted__count=count_per_poll(
+                Key.objects.exclude(response=Key.Response.NOT_RETURNED)
+            ),
         )
 
     @admin.display(description="В зале")
@@ -194,14 +238,16 @@ class PollAdmin(LimitForSecretary):
 
     @admin.display(description="Проголосовало")
     def voter_voted__count(self, obj: Poll):
-        voted = Key.objects.filter(poll=obj).exclude(response=Key.Response.NOT_RETURNED).count()
-        return f'{voted} из {obj.voter_local__count + obj.voter_remote__count}'
+        return f'{obj.voter_voted__count} из {obj.voter_local__count + obj.voter_remote__count}'
 
     def get_list_display(self, request: HttpRequest):
         if request.user.is_superuser:
             return self.list_display_su
         return self.list_display
 
+    def get_changelist(self, request: HttpRequest, **kwargs):
+        return PollChangeList
+
     @admin.display(description="Действие")
     def admin_action(self, _obj: Poll):
         return 'Только секретарь управляет голосованием'
@@ -236,41 +282,67 @@ class PollAdmin(LimitForSecretary):
     def start_poll(self, request: HttpRequest, queryset: QuerySet[Poll]):
         for poll in queryset.exclude(state=Poll.State.FINISHED):
             with transaction.atomic():
-                for voter in poll.voter_remote.all():  # type: Voter
-                    SendEmail.objects.get_or_create(
-                        voter=voter, poll=poll, secretary=request.user,
-                        defaults={'status':SendEmail.Status.READY},
-                    )
-                for voter in poll.voter_local.all():  # type: Voter
-                    SendEmail.objects.get_or_create(
-                        voter=voter, poll=poll, secretary=request.user,
-                        defaults={'status':SendEmail.Status.LOCAL},
-                    )
+                existing = set(
+                    SendEmail.objects.filter(
+                        poll=poll, secretary=request.user
+                    ).values_list('voter_id', flat=True)
+                )
+                send_emails: List[SendEmail] = []
+                for voters, status in (
+                    (poll.voter_remote, SendEmail.Status.READY),
+                    (poll.voter_local, SendEmail.Status.LOCAL),
+                ):
+                    for voter_id in voters.values_list('id', flat=True):
+                        if voter_id in existing:
+                            continue
+                        existing.add(voter_id)
+                        send_emails.append(SendEmail(
+                            voter_id=voter_id, poll=poll, secretary=request.user,
+                            status=status,
+                        ))
+                SendEmail.objects.bulk_create(send_emails, ignore_conflicts=True)
                 poll.state = Poll.State.STARTED
-                poll.save()
+                poll.save(update_fields=['state', 'updated_at'])
             poll.start_sending_thread()
             self.message_user(request, f"{poll} успешно запущено", messages.SUCCESS)
 
     @admin.action(description="Завершить голосование", permissions=["secretary"])
     def end_poll(self, request: HttpRequest, queryset: QuerySet[Poll]):
         with transaction.atomic():
-            queryset.filter(state=Poll.State.STARTED).update(state=Poll.State.FINISHED)
+            queryset.filter(state=Poll.State.STARTED).update(
+                state=Poll.State.FINISHED, updated_at=timezone_now()
+            )
             self.message_user(request, "Голосование успешно завершено", messages.SUCCESS)
 
     @admin.action(description="Дублировать голосование", permissions=["secretary"])
     def duplicate_poll(self, request: HttpRequest, queryset):
         with transaction.atomic():
-            for poll in queryset:  # type: Poll
-                orig_voter_local: QuerySet[Voter] = poll.voter_local.all()
-                orig_voter_remote: QuerySet[Voter] = poll.voter_remote.all()
+            polls: List[Poll] = list(queryset)
+            # voter ids are read for all polls at once, before `poll.pk` is reset
+            voter_ids = {
+                through: defaultdict(list)
+                for through in (Poll.voter_local.through, Poll.voter_remote.through)
+            }
+            for through, ids_by_poll in voter_ids.items():
+                rows = through.objects.filter(poll__in=polls).values_list('poll_id', 'voter_id')
+                for poll_id, voter_id in rows:
+                    ids_by_poll[poll_id].append(voter_id)
+            new_rows = {through: [] for through in voter_ids}
+            for poll in polls:
+                orig_pk = poll.pk
                 poll.pk = None
                 poll._state.adding = True
                 poll.state = Poll.State.NOT_STARTED
                 poll.save()
-                poll.voter_local.set(orig_voter_local)
-                poll.voter_remote.set(orig_voter_remote)
+                for through, ids_by_poll in voter_ids.items():
+                    new_rows[through].extend(
+                        through(poll_id=poll.pk, voter_id=voter_id)
+                        for voter_id in ids_by_poll[orig_pk]
+                    )
 
                 self.message_user(request, f"{poll} успешно дублировано", messages.SUCCESS)
+            for through, rows in new_rows.items():
+                through.objects.bulk_create(rows)
 
 
 class SecretaryPollFilter(admin.SimpleListFilter):
@@ -278,7 +350,7 @@ class SecretaryPollFilter(admin.SimpleListFilter):
     parameter_name = 'poll__id__exact'
 
     def lookups(self, request: HttpRequest, _model_admin):
-        queryset = self.queryset(request, Poll.objects.all())
+        queryset = self.queryset(request, Poll.objects.only('id', 'state'))
         ret = [(poll.pk, str(poll)) for poll in queryset.order_by('-date')[0:11]]
         return ret
 
@@ -298,6 +370,10 @@ class SendEmailAdmin(LimitForSecretary):
     list_filter = (SecretaryPollFilter, "status")
     fields = ("poll", "voter", "status", "visited", "info", "secretary", "url_get_bulletin")
 
+    def get_queryset(self, request: HttpRequest):
+        qs = super().get_queryset(request)
+        return qs.select_related("poll", "voter", "secretary")
+
     @admin.display(description="Одноразовая ссылка для получения бюллетеня")
     def url_get_bulletin(self, obj: SendEmail):
         return obj.url_get_bulletin()
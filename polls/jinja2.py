@@ -5,8 +5,11 @@ from jinja2 import Environment
 from django.utils.timezone import get_current_timezone
 
 
-def localtime(value, timezone = get_current_timezone()):
-    return value.astimezone(timezone).strftime("%Y-%m-%d %H:%M:%S")
+TZ = get_current_timezone()
+
+
+def localtime(value):
+    return value.astimezone(TZ).isoformat(sep=" ", timespec="seconds")[:19]
 
 
 def environment(**options):
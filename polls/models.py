@@ -1,12 +1,12 @@
 from __future__ import annotations
 import secrets
+from typing import List, Sequence
 from django.db import models
 import uuid
 from django.conf import settings
 from textwrap import dedent
 from django.utils.timezone import now as timezone_now
 from django.contrib.auth.models import User
-from string import digits
 from .jinja2 import localtime
 from django.core.mail import get_connection, EmailMessage
 
@@ -37,8 +37,8 @@ def now():
     return timezone_now().replace(microsecond=0,second=0)
 
 
-def secure_digits(k: int=8, digits: str=digits) -> str:
-    return "".join(secrets.choice(digits) for _ in range(k))
+def secure_digits(k: int=8) -> str:
+    return f"{secrets.randbelow(10 ** k):0{k}d}"
 
 
 class Poll(models.Model):
@@ -46,6 +46,7 @@ class Poll(models.Model):
     text = models.CharField('Диссертация', max_length=20000)
     allow_spoiling = models.BooleanField('Разрешить портить бюллетень', default=False)
     date = models.DateTimeField('Дата защиты', default=now, db_index=True)
+    updated_at = models.DateTimeField('Изменено', auto_now=True)
 
     voter_local = models.ManyToManyField(Voter, verbose_name='Присутствующие в зале члены совета', related_name='+', blank=True)
     voter_remote = models.ManyToManyField(Voter, verbose_name='Подключённые удалённо члены совета', related_name='+', blank=True)
@@ -67,6 +68,8 @@ class Poll(models.Model):
         STARTED = 'S', 'Идёт'
         FINISHED = 'F', 'Завершено'
 
+    STATE_LABELS = dict(State.choices)
+
     state = models.CharField(
         "Состояние",
         max_length=1,
@@ -85,51 +88,76 @@ class Poll(models.Model):
         ]
 
     def __str__(self):
-        return f'Голосование №{self.id} [{self.State(self.state).label}]'
+        return f'Голосование №{self.id} [{self.STATE_LABELS[self.state]}]'
 
     def create_private_key_for(self, send_email: SendEmail) -> Key:
         """
         returns private key and updates `send_email`
         """
+        return self.create_private_keys_for([send_email])[0]
+
+    def create_private_keys_for(self, send_emails: Sequence[SendEmail]) -> List[Key]:
+        """
+        returns one private key per `send_emails` item and marks them visited
+        """
         if self.state == Poll.State.FINISHED:
             raise ValueError("Голосование завершено")
-        if send_email.visited:
+        if any(send_email.visited for send_email in send_emails):
             raise ValueError("Бюллетень уже выдан")
+        if not send_emails:
+            return []
 
         if self.private_key_method == Poll.Method.SIX_DIGITS:
+            values: List[str] = []
             for _ in range(1000):
-                private_key_value = secure_digits(k=6)
-                assert len(private_key_value) == 6, "Метод создания приватного ключа вернул неправильное число цифр."
-                private_key, created = Key.objects.get_or_create(poll=self, value=private_key_value)
-                if created:
+                candidates = {
+                    secure_digits(k=6) for _ in range(len(send_emails) - len(values))
+                }
+                for private_key_value in candidates:
+                    assert len(private_key_value) == 6, "Метод создания приватного ключа вернул неправильное число цифр."
+                candidates.difference_update(values)
+                candidates.difference_update(
+                    Key.objects.filter(value__in=candidates).values_list('value', flat=True)
+                )
+                values.extend(candidates)
+                if len(values) == len(send_emails):
                     break
             else:
                 raise ValueError("Невозможно создать приватный ключ. Было произведено 1000 попыток.")
         else:
             raise ValueError(f"Неизвестный метод получения приватного ключа: {self.private_key_method}.")
 
-        send_email.visited = True
-        send_email.save(update_fields=["visited"])
-        return private_key
+        private_keys = Key.objects.bulk_create(
+            [Key(poll=self, value=value) for value in values]
+        )
+        SendEmail.objects.filter(
+            pk__in=[send_email.pk for send_email in send_emails]
+        ).update(visited=True)
+        for send_email in send_emails:
+            send_email.visited = True
+        return private_keys
 
     def start_sending_thread(self) -> None:
         """
         Not a thread because threading is quite painful with sqlite
         """
         with get_connection() as email_connection:
-            pks = tuple(
+            items = list(
                 SendEmail.objects.filter(
                     poll = self,
                     status__in = (SendEmail.Status.READY, SendEmail.Status.ERROR, SendEmail.Status.QUEUEING, SendEmail.Status.SENDING),
-                ).values_list(
-                    'pk', flat=True)
+                ).select_related('voter').only(
+                    'public_key', 'info', 'status', 'voter__fio', 'voter__email')
             )
-            if not pks:
+            if not items:
                 return
-            SendEmail.objects.filter(pk__in=pks).update(status=SendEmail.Status.QUEUEING)
-            for item in SendEmail.objects.filter(pk__in=pks):
+            SendEmail.objects.filter(
+                pk__in=[item.pk for item in items]
+            ).update(status=SendEmail.Status.QUEUEING)
+            for item in items:
+                item.poll = self
                 item.status = SendEmail.Status.SENDING
-                item.save()
+                item.save(update_fields=['status'])
                 try:
                     EmailMessage(
                         from_email=settings.DEFAULT_FROM_EMAIL,
@@ -144,12 +172,12 @@ class Poll(models.Model):
                 else:
                     item.status = SendEmail.Status.SUCCESS
                 item.info['time'] = localtime(timezone_now())
-                item.save()
+                item.save(update_fields=['status', 'info'])
 
 
 
 class SendEmail(models.Model):
-    info = models.JSONField('Состояние отправки', default=dict, null=False, db_index=True)
+    info = models.JSONField('Состояние отправки', default=dict, null=False)
     voter = models.ForeignKey(Voter, verbose_name="Чл. дисс. совета", on_delete=models.CASCADE)
     poll = models.ForeignKey(Poll,  verbose_name="Голосование", on_delete=models.CASCADE)
     public_key = models.UUIDField(primary_key=True, default=uuid.uuid4)
@@ -219,8 +247,9 @@ class Key(models.Model):
 
     class Meta:
         indexes = [
-            # this index exists because it might make poll statistics faster
-            models.Index(name="polls_poll_value_idx", fields=["poll", "response"]),
+            # this index exists because it might make poll statistics faster;
+            # `value` is included so results can be listed from the index alone
+            models.Index(name="polls_poll_value_idx", fields=["poll", "response", "value"]),
         ]
         ordering = ('poll', 'value')
 
@@ -236,3 +265,7 @@ class BadKey(models.Model):
 
     class Meta:
         ordering = ('-timestamp',)
+        indexes = [
+            # this index exists because results show the latest bad keys of a poll
+            models.Index(name="polls_badkey_poll_time_idx", fields=["poll", "-timestamp"]),
+        ]
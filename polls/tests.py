@@ -1,4 +1,4 @@
-from django.test import RequestFactory, TestCase, SimpleTestCase
+from django.test import RequestFactory, TestCase, SimpleTestCase, override_settings
 from unittest import mock
 from django.contrib.auth.models import User, Permission
 from django.test import Client
@@ -9,15 +9,22 @@ from typing import Any, Dict, List, Optional, Sequence, Tuple
 import uuid
 import re
 from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.urls import reverse
+
+
+_KEY_RE = re.compile(rb'<div class="key">(\S+)</div>')
+_BULLETIN_RE = re.compile(r"/get_bulletin/(\S+)")
+_RESULT_RE = re.compile(r">([А-Яа-я ]+): (\d+)<")
 
 
 def get_admin_view_url(obj: SendEmail, action: str="change") -> str:
-    from django.urls import reverse
     return reverse(
         f'admin:{obj._meta.app_label}_{obj.__class__.__name__.lower()}_{action}',
         args=(obj.pk,)
     )
 
+# PBKDF2 is deliberately slow and test passwords need no protection
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
 class WithSecretary(TestCase):
     SECRETARY_PASSWORD = "t0p_s3cr3t"
     SECRETARY_USERNAME = "test_secretary"
@@ -29,16 +36,16 @@ class WithSecretary(TestCase):
             password=password,
             is_staff=True,
         )
-        secretary.user_permissions.add(
-            Permission.objects.filter(codename='add_voter').get(),
-            Permission.objects.filter(codename='view_voter').get(),
-            Permission.objects.filter(codename='change_voter').get(),
-            Permission.objects.filter(codename='add_poll').get(),
-            Permission.objects.filter(codename='view_poll').get(),
-            Permission.objects.filter(codename='change_poll').get(),
-            Permission.objects.filter(codename='view_sendemail').get(),
-            Permission.objects.filter(codename='change_sendemail').get(),
-        )
+        secretary.user_permissions.add(*Permission.objects.filter(codename__in=(
+            'add_voter',
+            'view_voter',
+            'change_voter',
+            'add_poll',
+            'view_poll',
+            'change_poll',
+            'view_sendemail',
+            'change_sendemail',
+        )))
         return secretary
 
     @classmethod
@@ -51,36 +58,44 @@ class WithSecretary(TestCase):
 
     def setUp(self):
         self.factory = RequestFactory()
+        self._secretary_clients: Dict[int, Client] = {}
 
     def _secretary_client(self, secretary: Optional[User]=None):
-        c = Client()
-        c.force_login(user=secretary or self._secretary)
-        return c
+        secretary = secretary or self._secretary
+        if secretary.pk not in self._secretary_clients:
+            c = Client()
+            c.force_login(user=secretary)
+            self._secretary_clients[secretary.pk] = c
+        return self._secretary_clients[secretary.pk]
 
 
 class WithPoll(WithSecretary):
     @staticmethod
     def _create_voters_for(secretary: User) -> Tuple[List[Voter], List[Voter]]:
-        local_voters: List[Voter] = []
-        for local_voter_id in range(1, 11):
-            local_voters.append(
-                Voter.objects.create(
-                    fio=f"voter {local_voter_id} local",
-                    email=f"voter{local_voter_id}@localhost",
-                    secretary=secretary,
-                )
+        new_voters = [
+            Voter(
+                fio=f"voter {local_voter_id} local",
+                email=f"voter{local_voter_id}@localhost",
+                secretary=secretary,
             )
-
-        remote_voters: List[Voter] = []
-        for remote_voter_id in range(11, 21):
-            remote_voters.append(
-                Voter.objects.create(
-                    fio=f"voter {remote_voter_id} remote",
-                    email=f"voter{remote_voter_id}@localhost",
-                    secretary=secretary,
-                )
+            for local_voter_id in range(1, 11)
+        ] + [
+            Voter(
+                fio=f"voter {remote_voter_id} remote",
+                email=f"voter{remote_voter_id}@localhost",
+                secretary=secretary,
             )
-        return local_voters, remote_voters
+            for remote_voter_id in range(11, 21)
+        ]
+        Voter.objects.bulk_create(new_voters)
+        # sqlite doesn't return primary keys from `bulk_create`, so read back
+        # only the rows inserted above
+        voters = list(Voter.objects.filter(
+            secretary=secretary,
+            email__in=[voter.email for voter in new_voters],
+        ).order_by("-pk")[:len(new_voters)])[::-1]
+        assert len(voters) == len(new_voters)
+        return voters[:10], voters[10:]
 
     @classmethod
     def setUpTestData(cls):
@@ -122,14 +137,26 @@ class WithPoll(WithSecretary):
         c = self._secretary_client()
         response = c.get(f"/secretary/polls/poll/{poll.id}/print/")
         self.assertNotContains(response, "Ошибка:")
-        content = response.content.decode()
-        return re.findall('<div class="key">(\S+)</div>', content)
+        return [key.decode() for key in _KEY_RE.findall(response.content)]
+
+    @staticmethod
+    def _public_key(index: int = 0) -> str:
+        return _BULLETIN_RE.search(mail.outbox[index].body).group(1)
+
+    @staticmethod
+    def _parse_results(response) -> Dict[str, int]:
+        return {
+            label: int(count)
+            for label, count in _RESULT_RE.findall(response.content.decode())
+        }
 
-    def _go_and_vote_locally(self, poll: Poll, private_keys: List[str], response: List[Key.Response]):
-        c = Client()
+    def _vote_locally(self, poll: Poll, private_keys: List[str], response: List[Key.Response]):
+        """
+        posts the vote directly, the bulletin page itself is checked in
+        `test_voting_two_times_impossible`
+        """
+        c = self.client
         private_key = private_keys.pop()
-        bulletin_response = c.get(f"/vote/poll_{poll.id}/{private_key}/")
-        self.assertEqual(bulletin_response.status_code, 200)
         vote_response = c.post(
             f"/vote/poll_{poll.id}/{private_key}/",
             {"response": [r.value for r in response]},
@@ -143,7 +170,7 @@ class SendEmailTest(WithPoll):
         self.assertEqual(poll.voter_local.count(), len(self.local_voters))
         self.assertEqual(poll.voter_remote.count(), len(self.remote_voters))
         self.assertEqual(SendEmail.objects.filter(poll=poll).count(), 0)
-        self._start_polls(Poll.objects.filter(id=poll.id))
+        self._start_polls([poll])
         poll.refresh_from_db()
         self.assertEqual(poll.state, Poll.State.STARTED)
         self.assertEqual(
@@ -171,43 +198,60 @@ class SendEmailTest(WithPoll):
         polls_response = c.get("/secretary/polls/sendemail/")
         self.assertContains(polls_response, f'href="?poll__id__exact={poll1.pk}"')
         self.assertNotContains(polls_response, f'href="?poll__id__exact={poll2.pk}"')
-        response = c.get(f"/secretary/polls/sendemail/?poll__id__exact={poll1.pk}")
-        self.assertEqual(response.content.decode().count(str(poll1)), 16)
-        self.assertEqual(response.content.decode().count(str(poll2)), 0)
+        with self.assertNumQueries(8):
+            response = c.get(f"/secretary/polls/sendemail/?poll__id__exact={poll1.pk}")
+        content = response.content.decode()
+        self.assertEqual(content.count(str(poll1)), 16)
+        self.assertEqual(content.count(str(poll2)), 0)
 
 class PollsTest(WithPoll):
     def test_main_page_has_no_polls(self):
         poll = self._create_poll()
-        c = Client()
+        c = self.client
         response = c.get("/")
         self.assertNotContains(response, poll.title)
 
     def test_start_poll(self):
         poll = self._create_poll()
-        self._start_polls(Poll.objects.filter(id=poll.id))
+        self._start_polls([poll])
         poll.refresh_from_db()
         self.assertEqual(poll.state, Poll.State.STARTED)
 
-        c = Client()
+        c = self.client
         response = c.get("/")
         self.assertContains(response, poll.title)
 
-        self._end_polls(Poll.objects.filter(id=poll.id))
+        self._end_polls([poll])
         poll.refresh_from_db()
         self.assertEqual(poll.state, Poll.State.FINISHED)
 
-        c = Client()
+        c = self.client
         response = c.get("/")
         self.assertNotContains(response, poll.title)
 
+    def test_main_page_not_modified_until_polls_change(self):
+        poll = self._create_poll()
+        c = self.client
+        etag = c.get("/")["ETag"]
+        self.assertNotIn(" ", etag)
+        response = c.get("/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self._start_polls([poll])
+        response = c.get("/", HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, poll.title)
+        etag = response["ETag"]
+        self._end_polls([poll])
+        response = c.get("/", HTTP_IF_NONE_MATCH=etag)
+        self.assertNotContains(response, poll.title)
+
     def test_vote_email_closed_poll_404(self):
         poll = self._create_poll()
-        c = Client()
+        c = self.client
         get_bulletin_response = c.get(f"/get_bulletin/{uuid.uuid4()}/")
         self.assertEqual(get_bulletin_response.status_code, 404)
 
     def test_vote_on_unknown_poll(self):
-        c = Client()
+        c = self.client
         get_result = c.get(f"/vote/poll_42/123456/")
         self.assertContains(get_result, "Данного голосования не существует")
         post_result = c.post(f"/vote/poll_42/123456/")
@@ -238,19 +282,20 @@ class PollsTest(WithPoll):
         poll = self._create_poll()
         self._start_polls([poll])
         poll.start_sending_thread()
-        mocked_send.assert_has_calls([[]] * 6)
+        # sent once by the start action and retried once by the explicit call
+        self.assertEqual(mocked_send.call_count, 2 * len(self.remote_voters))
 
     def test_voting_two_times_impossible(self):
         poll = self._create_poll()
         self._start_polls([poll])
         poll.start_sending_thread()
-        public_key = re.search("/get_bulletin/(\S+)", mail.outbox[0].body).group(1)
-        c = Client()
+        public_key = self._public_key()
+        c = self.client
         get_bulletin_response = c.get(f"/get_bulletin/{public_key}/")
-        private_key = re.search(
-            '<div class="key">(\S+)</div>', get_bulletin_response.content.decode()
-        ).group(1)
-        poll_get_response = c.get(f"/vote/poll_{poll.id}/{private_key}/")
+        private_key = _KEY_RE.search(get_bulletin_response.content).group(1).decode()
+        # key and poll are fetched together
+        with self.assertNumQueries(1):
+            poll_get_response = c.get(f"/vote/poll_{poll.id}/{private_key}/")
         self.assertEqual(poll_get_response.status_code, 200)
         first_vote_response = c.post(
             f"/vote/poll_{poll.id}/{private_key}/", {"response": Key.Response.NO.value}
@@ -263,101 +308,122 @@ class PollsTest(WithPoll):
 
     def test_voting_closed_poll(self):
         poll = self._create_poll()
-        self._start_polls(Poll.objects.filter(id=poll.id))
+        self._start_polls([poll])
         poll.start_sending_thread()
-        public_key = re.search("/get_bulletin/(\S+)", mail.outbox[0].body).group(1)
-        c = Client()
+        public_key = self._public_key()
+        c = self.client
         get_bulletin_response = c.get(f"/get_bulletin/{public_key}/")
-        private_key = re.search(
-            '<div class="key">(\S+)</div>', get_bulletin_response.content.decode()
-        ).group(1)
-        self._end_polls(Poll.objects.filter(id=poll.id))
+        private_key = _KEY_RE.search(get_bulletin_response.content).group(1).decode()
+        self._end_polls([poll])
         poll_get_response = c.get(f"/vote/poll_{poll.id}/{private_key}/")
         self.assertContains(poll_get_response, "Данное голосование завершено")
 
     def test_voting_invalid_response(self):
         poll = self._create_poll()
-        self._start_polls(Poll.objects.filter(id=poll.id))
+        self._start_polls([poll])
         poll.start_sending_thread()
-        public_key = re.search("/get_bulletin/(\S+)", mail.outbox[0].body).group(1)
-        c = Client()
+        public_key = self._public_key()
+        c = self.client
         get_bulletin_response = c.get(f"/get_bulletin/{public_key}/")
-        private_key = re.search(
-            '<div class="key">(\S+)</div>', get_bulletin_response.content.decode()
-        ).group(1)
+        private_key = _KEY_RE.search(get_bulletin_response.content).group(1).decode()
         poll_get_response = c.post(f"/vote/poll_{poll.id}/{private_key}/", {"response": "TEST"})
         self.assertContains(poll_get_response, "Ответ не распознан")
         poll_get_response = c.post(f"/vote/poll_{poll.id}/{private_key}/", {})
         self.assertContains(poll_get_response, "Ответ не распознан")
+        poll_get_response = c.post(
+            f"/vote/poll_{poll.id}/{private_key}/", {"response": Key.Response.NOT_RETURNED.value}
+        )
+        self.assertContains(poll_get_response, "Ответ не распознан")
 
     def test_empty_results(self):
         poll = self._create_poll(allow_spoiling=False)
         self._start_polls([poll])
         self._end_polls([poll])
         c = self._secretary_client()
-        result = c.get(f'/secretary/polls/poll/{poll.id}/results/')
-        self.assertContains(result, ">Всего членов совета: 20<")
-        self.assertContains(result, ">Присутствовало на заседании: 14<")
-        self.assertContains(result, ">Роздано бюллетеней: 0<")
-        self.assertContains(result, ">Осталось нерозданных: 20<")
-        self.assertContains(result, ">Оказалось в урне: 0<")
-        self.assertContains(result, ">За присуждение степени: 0<")
-        self.assertContains(result, ">Против присуждение степени: 0<")
+        with self.assertNumQueries(8):
+            result = c.get(f'/secretary/polls/poll/{poll.id}/results/')
+        self.assertEqual(self._parse_results(result), {
+            "Всего членов совета": 20,
+            "Присутствовало на заседании": 14,
+            "Роздано бюллетеней": 0,
+            "Осталось нерозданных": 20,
+            "Оказалось в урне": 0,
+            "За присуждение степени": 0,
+            "Против присуждение степени": 0,
+            "Попыток голосовать с некорректным номером бюллетеня": 0,
+        })
 
     def test_results_single_vote_yes(self):
         poll = self._create_poll()
         self._start_polls([poll])
         private_keys = self._print_bulletins(poll)
         num_private_keys = len(private_keys)
-        self._go_and_vote_locally(poll, private_keys, [Key.Response.YES])
+        self._vote_locally(poll, private_keys, [Key.Response.YES])
         self._end_polls([poll])
         result = self._secretary_client().get(f'/secretary/polls/poll/{poll.id}/results/')
-        self.assertContains(result, ">Всего членов совета: 20<")
-        self.assertContains(result, ">Присутствовало на заседании: 14<")
-        self.assertContains(result, f">Роздано бюллетеней: {num_private_keys}<")
-        self.assertContains(result, f">Осталось нерозданных: {20 - num_private_keys}<")
-        self.assertContains(result, ">Оказалось в урне: 1<")
-        self.assertContains(result, ">За присуждение степени: 1<")
-        self.assertContains(result, ">Против присуждение степени: 0<")
+        self.assertEqual(self._parse_results(result), {
+            "Всего членов совета": 20,
+            "Присутствовало на заседании": 14,
+            "Роздано бюллетеней": num_private_keys,
+            "Осталось нерозданных": 20 - num_private_keys,
+            "Оказалось в урне": 1,
+            "За присуждение степени": 1,
+            "Против присуждение степени": 0,
+            "Попыток голосовать с некорректным номером бюллетеня": 0,
+        })
 
     def test_results_single_vote_no(self):
         poll = self._create_poll()
         self._start_polls([poll])
         private_keys = self._print_bulletins(poll)
         num_private_keys = len(private_keys)
-        self._go_and_vote_locally(poll, private_keys, [Key.Response.NO])
+        self._vote_locally(poll, private_keys, [Key.Response.NO])
         self._end_polls([poll])
         result = self._secretary_client().get(f'/secretary/polls/poll/{poll.id}/results/')
-        self.assertContains(result, ">Всего членов совета: 20<")
-        self.assertContains(result, ">Присутствовало на заседании: 14<")
-        self.assertContains(result, f">Роздано бюллетеней: {num_private_keys}<")
-        self.assertContains(result, f">Осталось нерозданных: {20 - num_private_keys}<")
-        self.assertContains(result, ">Оказалось в урне: 1<")
-        self.assertContains(result, ">За присуждение степени: 0<")
-        self.assertContains(result, ">Против присуждение степени: 1<")
+        self.assertEqual(self._parse_results(result), {
+            "Всего членов совета": 20,
+            "Присутствовало на заседании": 14,
+            "Роздано бюллетеней": num_private_keys,
+            "Осталось нерозданных": 20 - num_private_keys,
+            "Оказалось в урне": 1,
+            "За присуждение степени": 0,
+            "Против присуждение степени": 1,
+            "Попыток голосовать с некорректным номером бюллетеня": 0,
+        })
 
     def test_results_single_vote_spoil(self):
         poll = self._create_poll(allow_spoiling=True)
         self._start_polls([poll])
         private_keys = self._print_bulletins(poll)
         num_private_keys = len(private_keys)
-        self._go_and_vote_locally(poll, private_keys, [Key.Response.YES, Key.Response.NO])
+        self._vote_locally(poll, private_keys, [Key.Response.YES, Key.Response.NO])
         self._end_polls([poll])
         result = self._secretary_client().get(f'/secretary/polls/poll/{poll.id}/results/')
-        self.assertContains(result, ">Всего членов совета: 20<")
-        self.assertContains(result, ">Присутствовало на заседании: 14<")
-        self.assertContains(result, f">Роздано бюллетеней: {num_private_keys}<")
-        self.assertContains(result, f">Осталось нерозданных: {20 - num_private_keys}<")
-        self.assertContains(result, ">Оказалось в урне: 1<")
-        self.assertContains(result, ">За присуждение степени: 0<")
-        self.assertContains(result, ">Против присуждение степени: 0<")
-        self.assertContains(result, ">Недействительных бюллетеней: 1<")
+        self.assertEqual(self._parse_results(result), {
+            "Всего членов совета": 20,
+            "Присутствовало на заседании": 14,
+            "Роздано бюллетеней": num_private_keys,
+            "Осталось нерозданных": 20 - num_private_keys,
+            "Оказалось в урне": 1,
+            "За присуждение степени": 0,
+            "Против присуждение степени": 0,
+            "Недействительных бюллетеней": 1,
+            "Попыток голосовать с некорректным номером бюллетеня": 0,
+        })
+
+    def test_changelist_voted_count(self):
+        poll = self._create_poll()
+        self._start_polls([poll])
+        private_keys = self._print_bulletins(poll)
+        self._vote_locally(poll, private_keys, [Key.Response.YES])
+        response = self._secretary_client().get("/secretary/polls/poll/")
+        self.assertContains(response, ">1 из 14<")
 
     def test_spoling_not_allowed(self):
         poll = self._create_poll(allow_spoiling=False)
         self._start_polls([poll])
         private_keys = self._print_bulletins(poll)
-        c = Client()
+        c = self.client
         private_key = private_keys.pop()
         for response in (
                 [Key.Response.YES, Key.Response.NO],
@@ -372,7 +438,7 @@ class PollsTest(WithPoll):
     def test_results_single_vote_hackers(self):
         poll = self._create_poll()
         self._start_polls([poll])
-        c = Client()
+        c = self.client
         get_result = c.get(f"/vote/poll_{poll.id}/123456/")
         self.assertContains(
             get_result,
@@ -388,16 +454,16 @@ class PollsTest(WithPoll):
         )
         self._end_polls([poll])
         result = self._secretary_client().get(f'/secretary/polls/poll/{poll.id}/results/')
-        self.assertContains(result, ">Всего членов совета: 20<")
-        self.assertContains(result, ">Присутствовало на заседании: 14<")
-        self.assertContains(result, ">Роздано бюллетеней: 0<")
-        self.assertContains(result, ">Осталось нерозданных: 20<")
-        self.assertContains(result, ">Оказалось в урне: 0<")
-        self.assertContains(result, ">За присуждение степени: 0<")
-        self.assertContains(result, ">Против присуждение степени: 0<")
-        self.assertContains(
-            result, ">Попыток голосовать с некорректным номером бюллетеня: 2<"
-        )
+        self.assertEqual(self._parse_results(result), {
+            "Всего членов совета": 20,
+            "Присутствовало на заседании": 14,
+            "Роздано бюллетеней": 0,
+            "Осталось нерозданных": 20,
+            "Оказалось в урне": 0,
+            "За присуждение степени": 0,
+            "Против присуждение степени": 0,
+            "Попыток голосовать с некорректным номером бюллетеня": 2,
+        })
         self.assertContains(result, ">123456 в ")
         self.assertContains(result, ">789012 в ")
 
@@ -436,7 +502,8 @@ class PollsTest(WithPoll):
         created_poll = self._create_poll(title="created_poll")
         self._start_polls([finished_poll])
         self._end_polls([finished_poll])
-        get_polls_result = c.get("/secretary/polls/poll/")
+        with self.assertNumQueries(7):
+            get_polls_result = c.get("/secretary/polls/poll/")
         self.assertContains(get_polls_result, "started_poll")
         self.assertContains(get_polls_result, "finished_poll")
         self.assertContains(get_polls_result, "created_poll")
@@ -451,9 +518,12 @@ class PollsTest(WithPoll):
         poll = self._create_poll()
         self._duplicate_polls([poll])
         self.assertEqual(2, Poll.objects.all().count())
+        duplicate = Poll.objects.exclude(pk=poll.pk).get()
+        self.assertEqual(duplicate.voter_local.count(), len(self.local_voters))
+        self.assertEqual(duplicate.voter_remote.count(), len(self.remote_voters))
 
 
-class TranslateTest(WithPoll, WithSecretary, TestCase):
+class TranslateTest(WithPoll):
     def test_voter_admin_change_form(self):
         c = self._secretary_client()
         get_voter_request = c.get("/secretary/polls/voter/")
@@ -499,11 +569,13 @@ class TestPrint(WithPoll):
 
 
 class TestSuperuser(WithPoll):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls._superuser = User.objects.create_superuser("admin", "myemail@test", "password123")
+
     def _superuser_client(self):
-        User.objects.create_superuser("admin", "myemail@test", "password123")
-        c = Client()
-        self.assertTrue(c.login(username="admin", password="password123"))
-        return c
+        return self._secretary_client(secretary=self._superuser)
 
     def test_can_view_all_polls(self):
         sec1 = self._create_secretary("sec1", "sec1passw0rd")
@@ -531,45 +603,39 @@ class TestSuperuser(WithPoll):
         self.assertContains(polls_response, f'href="?poll__id__exact={poll2.pk}"')
 
 
-class TestGetBulletin(WithPoll, WithSecretary, TestCase):
+class TestGetBulletin(WithPoll):
     def test_get_bulletin_two_times(self):
         poll = self._create_poll()
-        self._start_polls(Poll.objects.filter(id=poll.id))
+        self._start_polls([poll])
         poll.start_sending_thread()
-        public_key = re.search("/get_bulletin/(\S+)", mail.outbox[0].body).group(1)
-        c = Client()
+        public_key = self._public_key()
+        c = self.client
         first_get_bulletin_response = c.get(f"/get_bulletin/{public_key}/")
-        first_private_key_re = re.search(
-            r'<div class="key">(\S+)</div>', first_get_bulletin_response.content.decode()
-        )
+        first_private_key_re = _KEY_RE.search(first_get_bulletin_response.content)
         self.assertIsNotNone(first_private_key_re)
         second_get_bulletin_response = c.get(f"/get_bulletin/{public_key}/")
-        second_private_key_re = re.search(
-            '<div class="key">(\S+)</div>', second_get_bulletin_response.content.decode()
-        )
+        second_private_key_re = _KEY_RE.search(second_get_bulletin_response.content)
         self.assertIsNone(second_private_key_re)
         self.assertContains(second_get_bulletin_response, "Бюллетень уже выдан")
 
     def test_get_bulletin_on_closed_poll(self):
         poll = self._create_poll()
-        self._start_polls(Poll.objects.filter(id=poll.id))
+        self._start_polls([poll])
         poll.start_sending_thread()
-        self._end_polls(Poll.objects.filter(id=poll.id))
-        public_key = re.search("/get_bulletin/(\S+)", mail.outbox[0].body).group(1)
-        c = Client()
+        self._end_polls([poll])
+        public_key = self._public_key()
+        c = self.client
         get_bulletin_response = c.get(f"/get_bulletin/{public_key}/")
-        private_key_re = re.search(
-            '<div class="key">(\S+)</div>', get_bulletin_response.content.decode()
-        )
+        private_key_re = _KEY_RE.search(get_bulletin_response.content)
         self.assertIsNone(private_key_re)
         self.assertContains(get_bulletin_response, "Голосование завершено")
 
     def test_get_bulletin_wrong_private_key_method(self):
         poll = self._create_poll(private_key_method = 'T')
-        self._start_polls(Poll.objects.filter(id=poll.id))
+        self._start_polls([poll])
         poll.start_sending_thread()
-        public_key = re.search("/get_bulletin/(\S+)", mail.outbox[0].body).group(1)
-        c = Client()
+        public_key = self._public_key()
+        c = self.client
         get_bulletin_response = c.get(f"/get_bulletin/{public_key}/")
         self.assertContains(get_bulletin_response, "Неизвестный метод получения приватного ключа: T")
 
@@ -591,22 +657,26 @@ class TestGetBulletin(WithPoll, WithSecretary, TestCase):
 
 
 class MiscellaneousTest(WithSecretary, TestCase):
+    """
+    `__str__` only formats fields, so the instances are never saved
+    """
     def create_test_voter(self):
-        return Voter.objects.create(
+        return Voter(
             fio="фио",
             email="test_voter@localhost",
             secretary=self._secretary,
         )
 
     def create_test_poll(self):
-        return Poll.objects.create(
+        return Poll(
+            pk=1,
             title="test poll title",
             text="test poll text",
             secretary=self._secretary,
         )
 
     def test_send_email_str(self):
-        send_email = SendEmail.objects.create(
+        send_email = SendEmail(
             voter=self.create_test_voter(),
             poll=self.create_test_poll(),
             secretary=self._secretary,
@@ -614,7 +684,7 @@ class MiscellaneousTest(WithSecretary, TestCase):
         self.assertEqual("фио (test_voter@localhost)", str(send_email))
 
     def test_key_str(self):
-        key = Key.objects.create(
+        key = Key(
             poll=self.create_test_poll(),
             value="123456",
             response=self._secretary,
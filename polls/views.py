@@ -1,29 +1,59 @@
-from typing import Dict, List
+from functools import lru_cache
+from typing import Dict, List, Tuple
 from django.shortcuts import render
+from django.template.loader import render_to_string
 from .models import SendEmail, Key, Poll, BadKey
-from django.http import Http404
+from django.http import Http404, HttpResponse
 from django.db import transaction
 from django.conf import settings
-from django.db.models import Count
-from django.views.decorators.cache import never_cache
+from django.db.models import Count, Max
+from django.views.decorators.cache import cache_control, never_cache
+from django.views.decorators.http import etag
 from django.http import HttpRequest
 
 
+# responses a voter may post; "not returned" is only a key's initial state
+VOTE_RESPONSES = {
+    response.value: response
+    for response in Key.Response
+    if response != Key.Response.NOT_RETURNED
+}
+YES_AND_NO = frozenset((Key.Response.YES, Key.Response.NO))
+POLL_STATE_LABELS_LOWER = {state: label.lower() for state, label in Poll.STATE_LABELS.items()}
+
+
+def index_etag(request: HttpRequest) -> str:
+    """
+    Changes whenever a poll is added, changed or deleted, or the site is updated
+    """
+    polls = Poll.objects.aggregate(count=Count("pk"), updated_at=Max("updated_at"))
+    updated_at = polls["updated_at"].timestamp() if polls["updated_at"] else 0
+    return f"{settings.VERSION_UUID}-{polls['count']}-{updated_at}"
+
+
+@cache_control(no_cache=True)
+@etag(index_etag)
 def index(request: HttpRequest):
-    states = {
-        item["state"]: item["total"]
-        for item in Poll.objects.all().values("state").annotate(total=Count("state"))
-    }
-    active_polls = list(Poll.objects.filter(state=Poll.State.STARTED))
+    active_polls = list(
+        Poll.objects.filter(state=Poll.State.STARTED).only("id", "title")
+    )
     return render(
         request,
         "polls/index.html",
-        {"states": states, "Poll": Poll, "active_polls": active_polls, 'settings': settings},
+        {"active_polls": active_polls, "VERSION_UUID": settings.VERSION_UUID},
     )
 
 
+@lru_cache(maxsize=64)
+def render_message(message: str, extra: Tuple[Tuple[str, str], ...]) -> str:
+    """
+    Messages are a small fixed set and don't depend on the request
+    """
+    return render_to_string("polls/message.html", {"message": message, **dict(extra)})
+
+
 def message(request:HttpRequest, message: str, extra: Dict[str, str]={}):
-    return render(request, "polls/message.html", {"message": message, **extra})
+    return HttpResponse(render_message(message, tuple(sorted(extra.items()))))
 
 
 def get_bulletin_common(request: HttpRequest, send_email: SendEmail, template_name: str, message_extra: Dict[str, str]={}):
@@ -37,7 +67,7 @@ def get_bulletin_common(request: HttpRequest, send_email: SendEmail, template_na
         return render(
             request,
             template_name,
-            {"url": url, "settings": settings, "private_key": private_key},
+            {"url": url, "EMAIL_LINK_START": settings.EMAIL_LINK_START, "private_key": private_key},
         )
 
 
@@ -46,9 +76,8 @@ def email_bulletin(request: HttpRequest, public_key: str):
     """
     Show page for getting private key for users with email link
     """
-    try:
-        send_email = SendEmail.objects.select_related("poll").get(public_key=public_key)
-    except SendEmail.DoesNotExist:
+    send_email = SendEmail.objects.select_related("poll").filter(public_key=public_key).first()
+    if send_email is None:
         raise Http404()
     return get_bulletin_common(request, send_email, "polls/get_bulletin.html")
 
@@ -58,47 +87,54 @@ def vote(request: HttpRequest, poll_id: int, private_key: str):
     """
     Show the bulletin with vote radio buttons
     """
-    try:
-        poll = Poll.objects.get(pk=poll_id)
-    except Poll.DoesNotExist:
+    keys = Key.objects.select_related("poll")
+    if request.method == "POST":
+        # the bulletin isn't rendered after voting, skip its largest columns
+        keys = keys.defer("poll__title", "poll__text")
+    key = keys.filter(value=private_key, poll=poll_id).first()
+    if key is not None:
+        poll = key.poll
+    else:
+        poll = Poll.objects.only("id", "state").filter(pk=poll_id).first()
+        if poll is None:
+            return message(
+                request,
+                "Данного голосования не существует",
+            )
+    if poll.state != Poll.State.STARTED:
         return message(
             request,
-            "Данного голосования не существует",
+            f"Данное голосование { POLL_STATE_LABELS_LOWER[poll.state] }",
         )
-    if poll.state != Poll.State.STARTED:
+
+    if key is None:
+        BadKey(value=private_key, poll=poll).save()
         return message(
             request,
-            f"Данное голосование { Poll.State(poll.state).label.lower() }",
+            "Данный номер бюллетеня не зарегистрирован в текущем голосовании",
         )
 
-    with transaction.atomic():
+    if request.method == "POST":
+        response_list: List[str] = request.POST.getlist("response")
         try:
-            key = Key.objects.get(value=private_key, poll=poll_id)
-        except Key.DoesNotExist:
-            BadKey(value=private_key, poll=poll).save()
-            return message(
-                request,
-                "Данный номер бюллетеня не зарегистрирован в текущем голосовании",
-            )
-        if request.method == "POST":
-            response_list: List[str] = request.POST.getlist("response")
-            try:
-                responses = {Key.Response(response) for response in response_list}
-                if responses == {Key.Response.YES, Key.Response.NO}:
-                    response = Key.Response.SPOILED
-                elif len(responses) == 1:
-                    response = responses.pop()
-                else:
-                    raise ValueError()
-                if not poll.allow_spoiling and response == Key.Response.SPOILED:
-                    return message(request, "В данном голосовании нельзя портить бюллетень")
-            except ValueError:
-                return message(request, "Ответ не распознан")
-            if key.response == Key.Response.NOT_RETURNED:  # good user
-                key.response = response
-                key.save()
-                return message(request, "Ваш голос учтён")
-        if key.response == key.Response.NOT_RETURNED:
-            return render(request, "polls/vote.html", {"key": key, "poll": key.poll})
-        else:
-            return message(request, "Ошибка: вы уже проголовали ранее")
+            responses = frozenset(VOTE_RESPONSES[response] for response in response_list)
+            if responses == YES_AND_NO:
+                response = Key.Response.SPOILED
+            elif len(responses) == 1:
+                (response,) = responses
+            else:
+                raise ValueError()
+            if not poll.allow_spoiling and response == Key.Response.SPOILED:
+                return message(request, "В данном голосовании нельзя портить бюллетень")
+        except (KeyError, ValueError):
+            return message(request, "Ответ не распознан")
+        # the database lets only the first vote through, no lock needed
+        if Key.objects.filter(
+            pk=key.pk, response=Key.Response.NOT_RETURNED
+        ).update(response=response):  # good user
+            return message(request, "Ваш голос учтён")
+        return message(request, "Ошибка: вы уже проголовали ранее")
+    if key.response == key.Response.NOT_RETURNED:
+        return render(request, "polls/vote.html", {"key": key, "poll": poll})
+    else:
+        return message(request, "Ошибка: вы уже проголовали ранее")